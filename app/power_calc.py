@@ -11,7 +11,10 @@ import sys
 import re
 import io
 import datetime
-import openpyxl
+from dataclasses import dataclass
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
 
 # UTF-8出力対応
 if sys.platform == "win32":
@@ -26,6 +29,7 @@ XLSX_DIR = os.path.join(DATA_DIR, "xlsx")
 LOG_FILE = os.path.join(DATA_DIR, "calc_log.txt")
 
 SKILL_RANK_ORDER = ["1", "2", "3", "4", "5", "6", "7", "特化I", "特化II", "特化III"]
+_SKILL_RANK_SET = frozenset(SKILL_RANK_ORDER)  # 所属判定用 (順序は SKILL_RANK_ORDER を使う)
 
 RANK_DISPLAY = {
     "1": "ランク1", "2": "ランク2", "3": "ランク3",
@@ -33,18 +37,72 @@ RANK_DISPLAY = {
     "特化I": "特化Ⅰ", "特化II": "特化Ⅱ", "特化III": "特化Ⅲ",
 }
 
+# 正規表現（呼び出しごとのコンパイル・キャッシュ参照を避けるため事前コンパイル）
+_ATK_SPEED_RE = re.compile(r"(\d+(?:\.\d+)?)s")
+# 攻撃倍率: 3パターンを1つにまとめ、「攻撃力」の出現位置ごとに先読みで判定する
+# (先読みにすることで、ある位置の +X% が後続の「攻撃力がX%に上昇」を飲み込まない)
+_MULT_RE = re.compile(
+    r"攻撃力(?="
+    r"[がが](?P<up>\d+(?:\.\d+)?)%[まにに]で?上昇"
+    r"|[^+\n]*?\+(?P<plus>\d+(?:\.\d+)?)%"
+    r"|[××x](?P<mul>\d+(?:\.\d+)?)"
+    r")"
+)
+_SKILL_SHEET_RE = re.compile(r"スキル(\d+) (.+?)1$")
+
+# load_skills の結果キャッシュ: {xlsx パス: (更新時刻, スキルリスト)}
+_SKILL_CACHE: dict[str, tuple[float, list[dict]]] = {}
+
+
+# ─── データ構造 ──────────────────────────────────────────────────
+
+@dataclass(slots=True)
+class Character:
+    """キャラクター情報 (CSV の1行)"""
+    image: str          # 画像ファイル名
+    name: str           # キャラ名
+    class_: str         # 職業
+    subclass: str       # 職分
+    hp: int
+    atk: int            # 攻撃力（信頼度ボーナス込み）
+    def_: int
+    res: int
+    redeploy: str
+    cost: int
+    block: int
+    atk_speed: float    # 攻撃間隔（秒）
+    atk_speed_str: str  # 攻撃速度の元テキスト
+    source: str         # 入手方法
+    tags: str           # 募集タグ
+
+
+@dataclass(slots=True)
+class RankData:
+    """スキル1ランク分のデータ (スキル詳細シートの1行)"""
+    init_sp: int | None
+    cost_sp: int | None
+    duration: float | None      # None = 持続なし（瞬時/パッシブ）
+    effect: str | None          # 効果テキスト
+    multiplier: float | None    # 攻撃倍率（1.0 = 等倍）
+    is_arts_effect: bool        # 効果テキストに「術ダメージ」を含むか
+
 
 # ─── データ読み込み ──────────────────────────────────────────────
 
 def parse_atk_speed(s: str) -> float:
     """'1.25s(やや遅い)' や '0.78s(とても速い)' などから秒数を抽出"""
-    m = re.search(r"(\d+(?:\.\d+)?)s", s)
+    m = _ATK_SPEED_RE.search(s)
     return float(m.group(1)) if m else 1.0
 
 
-def load_characters() -> list[dict]:
-    """CSVからキャラクター情報を読み込む"""
+def load_characters() -> list[Character]:
+    """
+    CSVからキャラクター情報を読み込む。
+    職業・職分・再配置など種類の少ない文字列は sys.intern で共有する。
+    """
     characters = []
+    # 攻撃速度の文字列は種類が少ないので、解析結果を使い回す
+    speed_cache: dict[str, float] = {}
     with open(CSV_FILE, newline="", encoding="utf-8-sig") as f:
         reader = csv.reader(f)
         next(reader)  # ヘッダー行スキップ
@@ -62,26 +120,119 @@ def load_characters() -> list[dict]:
             except ValueError:
                 continue
 
-            characters.append({
-                "image":       row[0].strip(),
-                "name":        name,
-                "class":       row[2].strip(),
-                "subclass":    row[3].strip(),
-                "hp":          int(row[4]),
-                "atk":         atk,
-                "def":         int(row[6]),
-                "res":         int(row[7]),
-                "redeploy":    row[8].strip(),
-                "cost":        int(row[9]),
-                "block":       int(row[10]),
-                "atk_speed":   parse_atk_speed(row[11]),
-                "atk_speed_str": row[11].strip(),
-                "source":      row[12].strip(),
-                "tags":        row[13].strip() if len(row) > 13 else "",
-            })
+            speed_str = row[11].strip()
+            atk_speed = speed_cache.get(speed_str)
+            if atk_speed is None:
+                atk_speed = speed_cache[speed_str] = parse_atk_speed(speed_str)
+
+            characters.append(Character(
+                image=row[0].strip(),
+                name=name,
+                class_=sys.intern(row[2].strip()),
+                subclass=sys.intern(row[3].strip()),
+                hp=int(row[4]),
+                atk=atk,
+                def_=int(row[6]),
+                res=int(row[7]),
+                redeploy=sys.intern(row[8].strip()),
+                cost=int(row[9]),
+                block=int(row[10]),
+                atk_speed=atk_speed,
+                atk_speed_str=speed_str,
+                source=row[12].strip(),
+                tags=row[13].strip() if len(row) > 13 else "",
+            ))
     return characters
 
 
+# ─── xlsx 読み込み ───────────────────────────────────────────────
+# openpyxl は使わず、xlsx (zip + XML) から必要な値だけを直接読む
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL  = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG  = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _xlsx_sheet_paths(zf: zipfile.ZipFile) -> dict[str, str]:
+    """シート名 → zip 内のワークシート XML のパス (シート順)"""
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {}
+    for rel in rels.iter(f"{_NS_PKG}Relationship"):
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            targets[rel.get("Id")] = target[1:]
+        else:
+            targets[rel.get("Id")] = posixpath.normpath(posixpath.join("xl", target))
+
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    return {
+        sheet.get("name"): targets.get(sheet.get(f"{_NS_REL}id"))
+        for sheet in wb.iter(f"{_NS_MAIN}sheet")
+    }
+
+
+def _xml_text(elem) -> str:
+    """<si> / <is> 要素の文字列 (リッチテキストは連結、ふりがなは除外)"""
+    parts = elem.findall(f"{_NS_MAIN}t") + elem.findall(f"{_NS_MAIN}r/{_NS_MAIN}t")
+    return "".join(t.text or "" for t in parts)
+
+
+def _xlsx_shared_strings(zf: zipfile.ZipFile) -> list[str]:
+    """共有文字列テーブルを読み込む (存在しない場合は空リスト)"""
+    try:
+        root = ET.fromstring(zf.read("xl/sharedStrings.xml"))
+    except KeyError:
+        return []
+    return [_xml_text(si) for si in root.iter(f"{_NS_MAIN}si")]
+
+
+def _column_index(ref: str) -> int:
+    """セル参照 'C12' → 列番号 3"""
+    n = 0
+    for ch in ref:
+        if ch.isdigit():
+            break
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def _cell_value(c, shared: list[str]):
+    """<c> 要素の値を Python の値に変換する"""
+    t = c.get("t", "n")
+    if t == "inlineStr":
+        is_elem = c.find(f"{_NS_MAIN}is")
+        return _xml_text(is_elem) if is_elem is not None else None
+
+    v = c.find(f"{_NS_MAIN}v")
+    if v is None or v.text is None:
+        return None
+    if t == "s":
+        return shared[int(v.text)]
+    if t == "b":
+        return v.text == "1"
+    if t == "n":
+        return float(v.text) if any(ch in v.text for ch in ".eE") else int(v.text)
+    return v.text  # str(数式の文字列結果) / e(エラー値) など
+
+
+def _iter_sheet_rows(zf: zipfile.ZipFile, member: str, shared: list[str], max_col: int = 5):
+    """ワークシート XML を逐次解析し、1〜max_col 列目の値タプルを行ごとに返す"""
+    with zf.open(member) as f:
+        values = [None] * max_col
+        col = 0
+        for _, elem in ET.iterparse(f):
+            if elem.tag == f"{_NS_MAIN}c":
+                ref = elem.get("r")
+                col = _column_index(ref) if ref else col + 1
+                if col <= max_col:
+                    values[col - 1] = _cell_value(elem, shared)
+            elif elem.tag == f"{_NS_MAIN}row":
+                yield tuple(values)
+                values = [None] * max_col
+                col = 0
+                elem.clear()
+
+
 # ─── スキルデータ解析 ────────────────────────────────────────────
 
 def _closest_field(value, prev_init, prev_cost, prev_dur) -> str:
@@ -161,42 +312,44 @@ def parse_damage_multiplier(effect: str):
       - 攻撃力、...(複数ステータス)+X%  → 1 + X/100
       - 攻撃力×X  → X
     """
-    if not effect:
+    # 「攻撃力」を含まない効果 (CC・回復のみなど) は正規表現を使わずに除外
+    if not effect or "攻撃力" not in effect:
         return None
 
-    # パターン1: 攻撃力がX%まで上昇 / 攻撃力がX%に上昇
-    m = re.search(r"攻撃力[がが](\d+(?:\.\d+)?)%[まにに]で?上昇", effect)
-    if m:
-        return float(m.group(1)) / 100.0
-
-    # パターン2: 攻撃力[任意文字]+X%
-    # 「攻撃力+X%」や「攻撃力、防御力、最大HP+X%」のどちらにも対応
-    m = re.search(r"攻撃力[^+\n]*?\+(\d+(?:\.\d+)?)%", effect)
-    if m:
-        return 1.0 + float(m.group(1)) / 100.0
-
-    # パターン3: 攻撃力×X / 攻撃力xX
-    m = re.search(r"攻撃力[××x](\d+(?:\.\d+)?)", effect)
-    if m:
-        return float(m.group(1))
-
+    # 文字列を1回だけ走査し、パターン1 > 2 > 3 の優先順位で採用する
+    plus = mul = None
+    for m in _MULT_RE.finditer(effect):
+        if m.group("up") is not None:
+            # パターン1: 攻撃力がX%まで上昇 / 攻撃力がX%に上昇
+            return float(m.group("up")) / 100.0
+        if plus is None and m.group("plus") is not None:
+            # パターン2: 攻撃力[任意文字]+X%
+            # 「攻撃力+X%」や「攻撃力、防御力、最大HP+X%」のどちらにも対応
+            plus = m.group("plus")
+        elif mul is None and m.group("mul") is not None:
+            # パターン3: 攻撃力×X / 攻撃力xX
+            mul = m.group("mul")
+
+    if plus is not None:
+        return 1.0 + float(plus) / 100.0
+    if mul is not None:
+        return float(mul)
     return None
 
 
-def parse_skill_sheet(ws) -> dict:
+def parse_skill_sheet(rows) -> dict:
     """
     スキル詳細シート(スキルN XXX1)を解析してランクごとのデータを返す。
-    返値: {rank_str: {init_sp, cost_sp, duration, effect, multiplier}}
+    rows: A〜E列の値タプルを行ごとに返すイテラブル
+    返値: {rank_str: RankData}
     """
-    # シートから行データを取得
-    row_data = []
-    for row in ws.iter_rows():
-        cells = {c.column_letter: c.value for c in row if c.value is not None}
-        if cells:
-            row_data.append(cells)
+    # 行はリストに溜めず、1回の走査で順に処理する
+    rows = iter(rows)
 
-    if len(row_data) < 2:
-        return {}
+    # 最初の空でない行(ヘッダー)まで読み飛ばす
+    for row in rows:
+        if any(v is not None for v in row):
+            break
 
     # 初期状態
     init_sp = None
@@ -204,19 +357,24 @@ def parse_skill_sheet(ws) -> dict:
     duration = None
     ranks = {}
 
-    for cells in row_data[1:]:  # ヘッダー行スキップ
-        rank = cells.get("A")
-        if rank not in SKILL_RANK_ORDER:
+    for row in rows:
+        rank = row[0]
+        if rank not in _SKILL_RANK_SET:
             continue
 
         # B〜E の値を順に取得
-        values = [cells[col] for col in ["B", "C", "D", "E"] if col in cells]
+        values = [v for v in row[1:5] if v is not None]
 
         # 効果テキスト(最後の文字列)と数値を分離
         effect_text = None
         numerics = []
 
         for v in values:
+            if isinstance(v, (int, float)):
+                # 数値セルは文字列に戻さずそのまま使う
+                numerics.append(v)
+                continue
+            # 文字列セル (xlsx では数値も文字列で入っていることが多い)
             s = str(v).strip()
             if s == "-":
                 # '-' は持続なし(パッシブ/瞬時)を意味する
@@ -244,49 +402,84 @@ def parse_skill_sheet(ws) -> dict:
         else:
             init_sp, cost_sp, duration = _update_state(init_sp, cost_sp, duration, numerics)
 
-        ranks[str(rank)] = {
-            "init_sp":    init_sp,
-            "cost_sp":    cost_sp,
-            "duration":   duration,
-            "effect":     effect_text,
-            "multiplier": parse_damage_multiplier(effect_text),
-        }
+        ranks[sys.intern(str(rank))] = RankData(
+            init_sp=init_sp,
+            cost_sp=cost_sp,
+            duration=duration,
+            effect=effect_text,
+            multiplier=parse_damage_multiplier(effect_text),
+            # 効果テキストに「術ダメージ」を含むか (ダメージ種別の推定用)
+            is_arts_effect=effect_text is not None and "術ダメージ" in effect_text,
+        )
 
     return ranks
 
 
+def _load_sheet_ranks(xlsx_path: str, member: str) -> dict:
+    """xlsx 内のワークシート XML (member) だけを読み込んでランク別データを解析する"""
+    with zipfile.ZipFile(xlsx_path) as zf:
+        shared = _xlsx_shared_strings(zf)
+        return parse_skill_sheet(_iter_sheet_rows(zf, member, shared))
+
+
 def load_skills(char_name: str) -> list[dict] | None:
-    """キャラ名に対応する xlsx からスキル情報を読み込む"""
+    """
+    キャラ名に対応する xlsx からスキル一覧を読み込む。
+    この時点ではシート名だけを見る。ランク別データは load_skill_ranks() で解析する。
+    """
     xlsx_path = os.path.join(XLSX_DIR, f"{char_name}.xlsx")
     if not os.path.exists(xlsx_path):
         return None
 
+    # 同じファイルを読み込み済みで、更新されていなければキャッシュを返す
+    mtime = os.path.getmtime(xlsx_path)
+    cached = _SKILL_CACHE.get(xlsx_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
     try:
-        wb = openpyxl.load_workbook(xlsx_path, data_only=True)
+        with zipfile.ZipFile(xlsx_path) as zf:
+            sheet_paths = _xlsx_sheet_paths(zf)
     except Exception as e:
         print(f"  [警告] {xlsx_path} の読み込みに失敗: {e}")
         return None
 
-    skills = []
-    for sheet_name in wb.sheetnames:
-        # "スキルN 名前1" (末尾が数字1) → 詳細データシート
-        m = re.match(r"スキル(\d+) (.+?)1$", sheet_name)
-        if not m:
-            continue
-        skill_num  = int(m.group(1))
-        skill_name = m.group(2)
-        ws = wb[sheet_name]
-        ranks = parse_skill_sheet(ws)
-        skills.append({
-            "num":   skill_num,
-            "name":  skill_name,
-            "ranks": ranks,
-        })
+    # "スキルN 名前1" (末尾が数字1) → 詳細データシート
+    # 対象シートを先に絞り込み、シート XML の場所もここで確定しておく
+    targets = [
+        (int(m.group(1)), m.group(2), name)
+        for name in sheet_paths if (m := _SKILL_SHEET_RE.match(name))
+    ]
+    skills = [
+        {
+            "num":    num,
+            "name":   skill_name,
+            "path":   xlsx_path,
+            "sheet":  sheet_name,
+            "member": sheet_paths[sheet_name],
+        }
+        for num, skill_name, sheet_name in targets
+    ]
 
     skills.sort(key=lambda x: x["num"])
+    _SKILL_CACHE[xlsx_path] = (mtime, skills)
     return skills
 
 
+def load_skill_ranks(skill: dict) -> dict:
+    """
+    スキルのランク別データを返す。
+    初回呼び出し時に詳細シートを解析し、結果を skill["ranks"] に保持する。
+    """
+    if "ranks" not in skill:
+        try:
+            skill["ranks"] = _load_sheet_ranks(skill["path"], skill["member"])
+        except Exception as e:
+            print(f"  [警告] {skill['path']} のシート「{skill['sheet']}」の読み込みに失敗: {e}")
+            return {}
+    return skill["ranks"]
+
+
 # ─── ダメージ計算 ────────────────────────────────────────────────
 
 def calc_damage(atk: int, multiplier: float, enemy_def: int,
@@ -308,13 +501,33 @@ def calc_damage(atk: int, multiplier: float, enemy_def: int,
     return raw, actual
 
 
+def calc_damage_batch(atk: int, multipliers: list[float], enemy_def: int,
+                      enemy_res: int, is_arts: bool) -> tuple[list[float], list[float]]:
+    """
+    複数の倍率 (ランクごとの倍率など) についてまとめてダメージを計算する。
+    返値: (軽減前ダメージのリスト, 実ダメージのリスト)、各要素は calc_damage() と同じ値
+
+    物理/術の分岐はループの外で1回だけ行う。
+    """
+    raws = [atk * m for m in multipliers]
+    if is_arts:
+        rate = 1.0 - min(enemy_res / 100.0, 0.95)
+        actuals = [raw * rate for raw in raws]
+    else:
+        actuals = [max(raw - enemy_def, raw * 0.05) for raw in raws]
+    return raws, actuals
+
+
 def calc_total_damage(actual_per_hit: float, duration,
-                      atk_speed: float, targets: int = 1) -> float | None:
-    """スキル継続中の総ダメージを計算する"""
+                      atk_speed: float, targets: int = 1) -> tuple[float, int] | None:
+    """
+    スキル継続中の総ダメージを計算する。
+    返値: (総ダメージ, ヒット数)、持続時間がない場合は None
+    """
     if duration is None or not isinstance(duration, (int, float)) or duration <= 0:
         return None
     hits = int(float(duration) / atk_speed)
-    return actual_per_hit * hits * targets
+    return actual_per_hit * hits * targets, hits
 
 
 # ─── ユーティリティ ──────────────────────────────────────────────
@@ -351,21 +564,24 @@ def select_from_list(items: list, prompt: str, display_fn=None) -> int:
 
 # ─── メイン ─────────────────────────────────────────────────────
 
-def calc_session(characters: list[dict]):
-    """1回分の計算セッション"""
+def calc_session(characters: list[Character], name_index: dict[str, Character], log_file=None):
+    """
+    1回分の計算セッション
+    name_index: キャラ名 → Character
+    log_file  : 結果を追記するログファイル (None ならログを残さない)
+    """
 
     # ─── キャラクター選択 ───
     print("\n【キャラクター選択】")
 
     def char_label(c):
-        return f"{c['name']:16s}  {c['class']:4s} / {c['subclass']:10s}  ATK:{c['atk']:4d}  速度:{c['atk_speed_str']}"
+        return f"{c.name:16s}  {c.class_:4s} / {c.subclass:10s}  ATK:{c.atk:4d}  速度:{c.atk_speed_str}"
 
     # キャラ名またはインデックスで検索
     while True:
         query = input("\nキャラ名または番号を入力 (一覧は 'list'): ").strip()
         if query.lower() == "list":
-            for i, c in enumerate(characters, 1):
-                print(f"  {i:3}. {char_label(c)}")
+            sys.stdout.write("".join(f"  {i:3}. {char_label(c)}\n" for i, c in enumerate(characters, 1)))
             continue
 
         char = None
@@ -373,26 +589,29 @@ def calc_session(characters: list[dict]):
             idx = int(query) - 1
             if 0 <= idx < len(characters):
                 char = characters[idx]
+        elif query in name_index:
+            # 完全一致は索引から直接引く
+            char = name_index[query]
         else:
             # 部分一致検索
-            matches = [c for c in characters if query in c["name"]]
+            matches = [c for c in characters if query in c.name]
             if len(matches) == 1:
                 char = matches[0]
             elif len(matches) > 1:
                 print(f"  {len(matches)} 件ヒットしました:")
-                idx = select_from_list(matches, "番号を選択", lambda c: c["name"])
+                idx = select_from_list(matches, "番号を選択", lambda c: c.name)
                 char = matches[idx]
         if char:
             break
         print("  キャラが見つかりませんでした。もう一度入力してください。")
 
-    print(f"\n  選択: {char['name']}")
-    print(f"  職業: {char['class']} / {char['subclass']}")
-    print(f"  攻撃力: {char['atk']}  攻撃速度: {char['atk_speed']}s  HP: {char['hp']}")
+    print(f"\n  選択: {char.name}")
+    print(f"  職業: {char.class_} / {char.subclass}")
+    print(f"  攻撃力: {char.atk}  攻撃速度: {char.atk_speed}s  HP: {char.hp}")
 
     # ─── スキルデータ読み込み ───
     print("\nスキルデータを読み込み中...")
-    skills = load_skills(char["name"])
+    skills = load_skills(char.name)
 
     if not skills:
         print("  スキルデータが見つかりません。")
@@ -416,29 +635,30 @@ def calc_session(characters: list[dict]):
         print("  有効なスキル番号を入力してください。")
 
     print(f"\n  選択: スキル{skill['num']} {skill['name']}")
+    ranks = load_skill_ranks(skill)
 
     # ─── ランク選択 ───
     print("\n【ランク選択】")
-    available = [r for r in SKILL_RANK_ORDER if r in skill["ranks"]]
+    available = [r for r in SKILL_RANK_ORDER if r in ranks]
 
     if not available:
         print("  ランクデータがありません。")
         return
 
     for r in available:
-        rd = skill["ranks"][r]
-        mult = rd.get("multiplier")
+        rd = ranks[r]
+        mult = rd.multiplier
         mult_str = f"  倍率:{mult:.0%}" if mult else ""
-        dur = rd.get("duration")
+        dur = rd.duration
         dur_str = f"  持続:{dur}s" if isinstance(dur, (int, float)) else "  持続:なし"
-        print(f"  {RANK_DISPLAY[r]:6s}  SP初期:{fmt_sp(rd['init_sp']):>4}  SP必要:{fmt_sp(rd['cost_sp']):>4}"
+        print(f"  {RANK_DISPLAY[r]:6s}  SP初期:{fmt_sp(rd.init_sp):>4}  SP必要:{fmt_sp(rd.cost_sp):>4}"
               f"{dur_str}{mult_str}")
 
     while True:
         r_input = input("\nランクを入力 (例: 7 / 特化I / 特化II / 特化III): ").strip()
         # 入力の正規化
         r_norm = r_input.replace("Ⅰ", "I").replace("Ⅱ", "II").replace("Ⅲ", "III")
-        if r_norm in skill["ranks"]:
+        if r_norm in ranks:
             selected_rank = r_norm
             break
         # 短縮入力サポート: "3" → "特化III", "m3" → "特化III"
@@ -447,25 +667,22 @@ def calc_session(characters: list[dict]):
             "1": "1", "2": "2", "3": "3", "4": "4",
             "5": "5", "6": "6", "7": "7",
         }
-        if r_input in alias and alias[r_input] in skill["ranks"]:
+        if r_input in alias and alias[r_input] in ranks:
             selected_rank = alias[r_input]
             break
         print("  有効なランクを入力してください。")
 
-    rank_data = skill["ranks"][selected_rank]
+    rank_data = ranks[selected_rank]
 
     print(f"\n  選択ランク: {RANK_DISPLAY[selected_rank]}")
-    if rank_data["effect"]:
-        print(f"  効果: {rank_data['effect'][:80]}...")
+    if rank_data.effect:
+        print(f"  効果: {rank_data.effect[:80]}...")
 
     # ─── ダメージ種別 ───
     print("\n【ダメージ種別】")
 
     # 効果テキストから自動判定
-    arts_auto = (
-        char["class"] == "術師"
-        or (rank_data["effect"] and "術ダメージ" in rank_data["effect"])
-    )
+    arts_auto = char.class_ == "術師" or rank_data.is_arts_effect
 
     print(f"  1. 物理ダメージ{'  ← 推定' if not arts_auto else ''}")
     print(f"  2. 術ダメージ{'  ← 推定' if arts_auto else ''}")
@@ -493,12 +710,12 @@ def calc_session(characters: list[dict]):
     targets = input_int("攻撃対象数 (スキル中の同時攻撃数)", 1)
 
     # ─── 倍率確認 / 手動入力 ───
-    multiplier = rank_data.get("multiplier")
+    multiplier = rank_data.multiplier
 
     if multiplier is None:
         print("\n  [注意] 攻撃倍率を効果テキストから自動解析できませんでした。")
-        if rank_data["effect"]:
-            print(f"  効果テキスト: {rank_data['effect']}")
+        if rank_data.effect:
+            print(f"  効果テキスト: {rank_data.effect}")
         while True:
             try:
                 s = input("  攻撃倍率を手動で入力 (例: 3.30 = 330%): ").strip()
@@ -508,7 +725,7 @@ def calc_session(characters: list[dict]):
                 print("  数値を入力してください (例: 3.30)")
 
     # ─── 持続時間の確認 / 手動入力 ───
-    duration = rank_data.get("duration")
+    duration = rank_data.duration
     if not isinstance(duration, (int, float)) or duration <= 0:
         print(f"\n  [情報] 持続時間がデータにありません (持続:'-' またはデータ不足)")
         dur_input = input("  持続時間を手動で入力 (例: 40  / スキップはEnter): ").strip()
@@ -520,14 +737,16 @@ def calc_session(characters: list[dict]):
 
     # ─── 計算 ───
     raw_dmg, actual_dmg = calc_damage(
-        char["atk"], multiplier, enemy_def, enemy_res, is_arts
+        char.atk, multiplier, enemy_def, enemy_res, is_arts
     )
 
-    total_dmg = calc_total_damage(actual_dmg, duration, char["atk_speed"], targets)
+    total = calc_total_damage(actual_dmg, duration, char.atk_speed, targets)
 
-    hits = None
-    if isinstance(duration, (int, float)) and duration > 0:
-        hits = int(duration / char["atk_speed"])
+    # ランク別比較: 倍率を解析できた全ランクを同じ敵ステータスでまとめて計算
+    cmp_ranks = [r for r in available if ranks[r].multiplier is not None]
+    _, cmp_actuals = calc_damage_batch(
+        char.atk, [ranks[r].multiplier for r in cmp_ranks], enemy_def, enemy_res, is_arts
+    )
 
     # ─── 結果表示 & ログ記録 ───
     lines = []
@@ -535,10 +754,10 @@ def calc_session(characters: list[dict]):
     lines.append("=" * 60)
     lines.append("  ===  火力計算結果  ===")
     lines.append("=" * 60)
-    lines.append(f"  キャラクター : {char['name']}")
+    lines.append(f"  キャラクター : {char.name}")
     lines.append(f"  スキル       : スキル{skill['num']} {skill['name']} [{RANK_DISPLAY[selected_rank]}]")
-    lines.append(f"  攻撃力       : {char['atk']}")
-    lines.append(f"  攻撃速度     : {char['atk_speed']}s / hit")
+    lines.append(f"  攻撃力       : {char.atk}")
+    lines.append(f"  攻撃速度     : {char.atk_speed}s / hit")
     lines.append(f"  ダメージ種別 : {'術ダメージ' if is_arts else '物理ダメージ'}")
     if is_arts:
         lines.append(f"  敵の術耐性   : {enemy_res}%")
@@ -563,21 +782,29 @@ def calc_session(characters: list[dict]):
     if targets > 1:
         lines.append(f"    {targets}体合計        : {actual_dmg * targets:,.0f}")
 
+    if len(cmp_ranks) > 1:
+        lines.append("")
+        lines.append("  【ランク別の実ダメージ (同条件・1発あたり)】")
+        for r, dmg in zip(cmp_ranks, cmp_actuals):
+            mark = "  ← 選択中" if r == selected_rank else ""
+            lines.append(f"    {RANK_DISPLAY[r]:6s}: {dmg:,.0f}{mark}")
+
     lines.append("")
     lines.append("  【スキル継続中の総ダメージ】")
-    if isinstance(duration, (int, float)) and duration > 0:
+    if total is not None:
+        total_dmg, hits = total
         lines.append(f"    持続時間   : {duration}s")
         lines.append(f"    ヒット数   : {hits} 回 × {targets} 体")
         lines.append(f"    総ダメージ : {total_dmg:,.0f}")
-        dps = actual_dmg / char["atk_speed"] * targets
+        dps = actual_dmg / char.atk_speed * targets
         lines.append(f"    スキル中DPS: {dps:,.1f} / s")
     else:
         lines.append("    持続時間なし（瞬時発動・パッシブ型）")
-        lines.append(f"    ※ 通常攻撃DPS = {char['atk'] / char['atk_speed']:,.1f} / s")
+        lines.append(f"    ※ 通常攻撃DPS = {char.atk / char.atk_speed:,.1f} / s")
 
     # SP効率参考
-    init = rank_data.get("init_sp")
-    cost = rank_data.get("cost_sp")
+    init = rank_data.init_sp
+    cost = rank_data.cost_sp
     lines.append("")
     lines.append("  【SP情報 (参考)】")
     lines.append(f"    初期SP: {fmt_sp(init)}  /  必要SP: {fmt_sp(cost)}")
@@ -585,17 +812,17 @@ def calc_session(characters: list[dict]):
     lines.append("")
     lines.append("=" * 60)
 
-    # 画面出力
-    for line in lines:
-        print(line)
+    # 画面出力 (1回の write にまとめる)
+    sys.stdout.write("\n".join(lines) + "\n")
 
-    # ファイル出力（追記）
+    # ファイル出力（追記）: 1回の write にまとめ、セッションごとに flush する
+    if log_file is None:
+        return
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    body = "\n".join(lines)
     try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(f"\n[{timestamp}]\n")
-            f.write("\n".join(lines))
-            f.write("\n")
+        log_file.write(f"\n[{timestamp}]\n{body}\n")
+        log_file.flush()
         print(f"  [ログ保存] {LOG_FILE}")
     except OSError as e:
         print(f"  [警告] ログ保存に失敗しました: {e}")
@@ -610,22 +837,41 @@ def main():
     print("\nキャラクターデータを読み込み中...")
     characters = load_characters()
     print(f"  {len(characters)} キャラクター読み込み完了")
+    name_index = {c.name: c for c in characters}
 
-    while True:
-        try:
-            calc_session(characters)
-        except (KeyboardInterrupt, EOFError):
-            print("\n\n終了します。")
-            break
-        try:
-            again = input("\n別の計算をしますか？ (y/N): ").strip().lower()
-        except (KeyboardInterrupt, EOFError):
-            print("\n終了します。")
-            break
-        if again != "y":
-            print("終了します。")
-            break
+    # ログファイルはループ中開いたままにする
+    try:
+        log_file = open(LOG_FILE, "a", encoding="utf-8", buffering=8192)
+    except OSError as e:
+        print(f"  [警告] ログファイルを開けませんでした: {e}")
+        log_file = None
+
+    try:
+        while True:
+            try:
+                calc_session(characters, name_index, log_file)
+            except (KeyboardInterrupt, EOFError):
+                print("\n\n終了します。")
+                break
+            try:
+                again = input("\n別の計算をしますか？ (y/N): ").strip().lower()
+            except (KeyboardInterrupt, EOFError):
+                print("\n終了します。")
+                break
+            if again != "y":
+                print("終了します。")
+                break
+    finally:
+        if log_file is not None:
+            log_file.close()
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except BrokenPipeError:
+        # 出力先 (head / less など) が先に閉じられた場合はトレースバックを出さずに終了
+        # (終了時の flush で再度エラーにならないよう stdout を devnull に差し替える)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
@@ -23,21 +23,27 @@ COLLAPSE_DIRS = {"images", "xlsx"}
 def build_tree(root: str, prefix: str = "") -> list[str]:
     """ディレクトリツリーを文字列リストで返す（再帰）"""
     try:
-        entries = sorted(os.scandir(root), key=lambda e: (not e.is_dir(), e.name.lower()))
+        with os.scandir(root) as it:
+            # 除外対象は is_dir() の判定より先に落とす
+            entries = [
+                (e.is_dir(follow_symlinks=False), e)
+                for e in it if e.name not in EXCLUDE_DIRS
+            ]
     except PermissionError:
         return []
 
-    entries = [e for e in entries if e.name not in EXCLUDE_DIRS]
+    entries.sort(key=lambda x: (not x[0], x[1].name.lower()))
 
     lines = []
-    for i, entry in enumerate(entries):
+    for i, (is_dir, entry) in enumerate(entries):
         is_last = (i == len(entries) - 1)
         connector   = "└── " if is_last else "├── "
         child_prefix = "    " if is_last else "│   "
 
-        if entry.is_dir():
+        if is_dir:
             if entry.name in COLLAPSE_DIRS:
-                count = sum(1 for _ in os.scandir(entry.path))
+                with os.scandir(entry.path) as it:
+                    count = sum(1 for _ in it)
                 lines.append(f"{prefix}{connector}{entry.name}/  （{count} ファイル）")
             else:
                 lines.append(f"{prefix}{connector}{entry.name}/")